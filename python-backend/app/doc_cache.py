@@ -0,0 +1,233 @@
+"""
+Document Cache
+Read-through / write-through cache in front of the FN7 SDK
+"""
+
+import copy
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+# Per-collection settings: (ttl in seconds, max cached documents).
+# Collections are keyed by the last segment of the doc_type, so
+# "leadsetRuns/{run_id}/items" is configured under "items".
+DEFAULT_COLLECTION_SETTINGS = {
+    "leadsets": (300, 256),
+    "leadsetRuns": (30, 256),
+    "items": (120, 5000),
+}
+FALLBACK_SETTINGS = (30, 256)
+
+# How many per-key write generations and per-run read counters to remember
+MAX_TRACKED_KEYS = 20000
+MAX_TRACKED_RUNS = 500
+
+
+def _collection_name(doc_type: str) -> str:
+    return doc_type.rstrip("/").split("/")[-1]
+
+
+def _run_id_for(doc_type: str, doc_id: str) -> Optional[str]:
+    """The run a document belongs to: the run doc itself or anything under leadsetRuns/{run_id}/."""
+    segments = doc_type.strip("/").split("/")
+    if segments[0] != "leadsetRuns":
+        return None
+    return segments[1] if len(segments) > 1 else doc_id
+
+
+class _CollectionCache:
+    """LRU map of doc key -> (expires_at, data) for a single collection."""
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries: "OrderedDict[Tuple[str, str], Tuple[float, dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, data = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def put(self, key, data: dict):
+        self.entries[key] = (time.monotonic() + self.ttl, data)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def merge(self, key, updates: dict):
+        """Apply a top-level field update to a cached document, if present."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        expires_at, data = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return
+        self.put(key, {**data, **updates})
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.entries),
+        }
+
+
+class CachedSDK:
+    """
+    Wraps an FN7SDK instance with a document cache.
+
+    Reads via get_firebase_data are served from memory while fresh.
+    Our own create/update calls write through to the cached copy (the document
+    the SDK returns, or a merge of our fields if it returns none) so the
+    common "write then read back" pattern never hits Firestore twice.
+    Anything not overridden here is delegated to the wrapped SDK.
+    """
+
+    def __init__(self, sdk, settings: Optional[Dict[str, Tuple[float, int]]] = None):
+        self._sdk = sdk
+        self._settings = {**DEFAULT_COLLECTION_SETTINGS, **(settings or {})}
+        self._collections: Dict[str, _CollectionCache] = {}
+        self._lock = threading.Lock()
+        # Per-key write generations, so a slow read never overwrites a newer write-through.
+        # Forgotten keys fall back to the highest generation evicted so far.
+        self._write_seq = 0
+        self._generations: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self._evicted_generation = 0
+        # Firestore reads and cache hits per run ID
+        self._run_reads: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._sdk, name)
+
+    def _cache_for(self, doc_type: str) -> _CollectionCache:
+        name = _collection_name(doc_type)
+        cache = self._collections.get(name)
+        if cache is None:
+            ttl, max_size = self._settings.get(name, FALLBACK_SETTINGS)
+            cache = self._collections[name] = _CollectionCache(ttl, max_size)
+        return cache
+
+    def _generation(self, key) -> int:
+        return self._generations.get(key, self._evicted_generation)
+
+    def _bump_generation(self, key):
+        """Record a write to key. Must be called with the lock held."""
+        self._write_seq += 1
+        self._generations[key] = self._write_seq
+        self._generations.move_to_end(key)
+        while len(self._generations) > MAX_TRACKED_KEYS:
+            _, generation = self._generations.popitem(last=False)
+            self._evicted_generation = max(self._evicted_generation, generation)
+
+    def _count_run_read(self, doc_type: str, doc_id: str, field: str, count: int = 1):
+        """Attribute a read to its run. Must be called with the lock held."""
+        run_id = _run_id_for(doc_type, doc_id)
+        if not run_id:
+            return
+        counters = self._run_reads.get(run_id)
+        if counters is None:
+            counters = self._run_reads[run_id] = {"firestoreReads": 0, "cacheHits": 0}
+        counters[field] += count
+        self._run_reads.move_to_end(run_id)
+        while len(self._run_reads) > MAX_TRACKED_RUNS:
+            self._run_reads.popitem(last=False)
+
+    # --- Reads ---
+
+    def get_firebase_data(self, doc_type: str, doc_id: str, *args, **kwargs):
+        key = (doc_type, doc_id)
+        with self._lock:
+            cached = self._cache_for(doc_type).get(key)
+            if cached is not None:
+                self._count_run_read(doc_type, doc_id, "cacheHits")
+                return copy.deepcopy(cached)
+            self._count_run_read(doc_type, doc_id, "firestoreReads")
+            generation = self._generation(key)
+
+        data = self._sdk.get_firebase_data(doc_type, doc_id, *args, **kwargs)
+        if data:
+            with self._lock:
+                # Skip caching if one of our writes landed while we were reading
+                if self._generation(key) == generation:
+                    self._cache_for(doc_type).put(key, copy.deepcopy(data))
+        return data
+
+    def record_reads(self, run_id: str, count: int):
+        """Count Firestore reads made around the cache (e.g. streaming a run's items)."""
+        with self._lock:
+            self._count_run_read("leadsetRuns", run_id, "firestoreReads", count)
+
+    # --- Writes ---
+
+    def create_firebase_data(self, doc_type: str, doc_id: str, data: dict, *args, **kwargs):
+        result = self._sdk.create_firebase_data(doc_type, doc_id, data, *args, **kwargs)
+        # The SDK returns the stored document (with doc_id/created_at/... metadata);
+        # cache that so cached reads have the same shape as Firestore reads
+        stored = result if isinstance(result, dict) else data
+        with self._lock:
+            self._bump_generation((doc_type, doc_id))
+            self._cache_for(doc_type).put((doc_type, doc_id), copy.deepcopy(stored))
+        return result
+
+    def update_firebase_data(self, doc_type: str, doc_id: str, data: dict, *args, **kwargs):
+        key = (doc_type, doc_id)
+        try:
+            result = self._sdk.update_firebase_data(doc_type, doc_id, data, *args, **kwargs)
+        except Exception:
+            # State on the server is unknown, drop our copy
+            self.invalidate(doc_type, doc_id)
+            raise
+        with self._lock:
+            self._bump_generation(key)
+            if isinstance(result, dict):
+                self._cache_for(doc_type).put(key, copy.deepcopy(result))
+            else:
+                self._cache_for(doc_type).merge(key, copy.deepcopy(data))
+        return result
+
+    def delete_firebase_data(self, doc_type: str, doc_id: str, *args, **kwargs):
+        self.invalidate(doc_type, doc_id)
+        return self._sdk.delete_firebase_data(doc_type, doc_id, *args, **kwargs)
+
+    # --- Cache management ---
+
+    def invalidate(self, doc_type: str, doc_id: Optional[str] = None):
+        """Drop one cached document, or every document under doc_type."""
+        with self._lock:
+            cache = self._cache_for(doc_type)
+            if doc_id is not None:
+                cache.entries.pop((doc_type, doc_id), None)
+                self._bump_generation((doc_type, doc_id))
+            else:
+                for key in [k for k in cache.entries if k[0] == doc_type]:
+                    del cache.entries[key]
+                    self._bump_generation(key)
+
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit/miss counters per collection, and Firestore reads vs cache hits per run."""
+        with self._lock:
+            return {
+                "collections": {name: cache.stats() for name, cache in self._collections.items()},
+                "runs": {run_id: dict(counters) for run_id, counters in self._run_reads.items()},
+            }
+
+    def run_read_stats(self, run_id: str) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._run_reads.get(run_id, {"firestoreReads": 0, "cacheHits": 0}))
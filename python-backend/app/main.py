@@ -15,11 +15,23 @@ import requests
 from typing import List, Optional
 from fastapi import FastAPI, Request, HTTPException, Header, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from fn7_sdk import FN7SDK
 import asyncio
 
+from .doc_cache import CachedSDK
+from .run_snapshot import (
+    write_run_snapshot, load_run_snapshot, list_run_items, write_run_items,
+    stale_snapshot_fields
+)
+from .profiling import (
+    profiled_run_task, profiled_endpoint, profile_section, profiling_requested,
+    profiling_authorized, enable_run_profiling, run_profiling_enabled,
+    set_run_profiling, profiled_run_ids, list_profiles, profile_path
+)
+
 load_dotenv()
 
 app = FastAPI()
@@ -36,7 +48,9 @@ try:
     if "/" in bucket_name:
         bucket_name = bucket_name.split("/")[0]
     
-    sdk = FN7SDK(storage_bucket_name=bucket_name)
+    # Wrap the SDK with a document cache so hot documents (leadsets, runs, items)
+    # are not re-read from Firestore on every access
+    sdk = CachedSDK(FN7SDK(storage_bucket_name=bucket_name))
     print("✅ FN7 SDK initialized successfully")
 except Exception as e:
     print(f"⚠️  Warning: Failed to initialize SDK: {e}")
@@ -45,7 +59,9 @@ except Exception as e:
 
 # Exa SDK Imports
 from exa_py import Exa
-from exa_py.websets.types import CreateWebsetParameters, CreateEnrichmentParameters
+from exa_py.websets.types import (
+    CreateWebsetParameters, CreateWebsetSearchParameters, CreateEnrichmentParameters
+)
 
 
 app.add_middleware(
@@ -64,6 +80,19 @@ app.add_middleware(
 # Ensure EXA_API_KEY is set in your .env file
 exa = Exa(api_key=os.getenv("EXA_API_KEY"))
 
+# Search sizing: runs fill the leadset up to its est_count and grow the webset
+# in chunks, stopping early once enough new items have been found
+DEFAULT_TARGET_COUNT = 25
+MAX_TARGET_COUNT = int(os.getenv("MAX_RUN_ITEMS", "500"))
+SEARCH_CHUNK_SIZE = int(os.getenv("SEARCH_CHUNK_SIZE", "25"))
+EXTRA_SEARCH_ROUNDS = 2  # Rounds allowed beyond target/chunk to make up for duplicates
+# Items scoring below this are not kept. Items are not scored yet (score is always 0),
+# so the default of 0 keeps everything.
+MIN_ITEM_SCORE = float(os.getenv("MIN_ITEM_SCORE", "0"))
+EXA_COST_PER_RESULT = float(os.getenv("EXA_COST_PER_RESULT", "0.01"))
+# Charged per result for each enrichment still active on a reused webset
+EXA_ENRICHMENT_COST_PER_RESULT = float(os.getenv("EXA_ENRICHMENT_COST_PER_RESULT", "0.01"))
+
 
 
 class EnrichRequest(BaseModel):
@@ -103,90 +132,248 @@ def verify_exa_signature(signature_header: str, body: bytes, secret: str) -> boo
 
 # --- Endpoints ---
 
-def process_run_background(run_id: str, webset_id: str, leadset_id: str):
-    """Background task to wait for Exa search and process results."""
+def map_exa_item(item, run_id: str, leadset_id: str) -> dict:
+    """Map an Exa webset item to our item schema."""
+    # Safe access to properties
+    props = item.properties if hasattr(item, 'properties') else item
+    
+    # Extract URL safely
+    url = getattr(props, 'url', None)
+    if url:
+        url = str(url)
+
+    # Safely extract domain
+    domain = "unknown"
+    if url:
+        try:
+            domain = url.split("//")[-1].split("/")[0]
+        except: 
+            pass
+    
+    # Extract Company Name / Title
+    company_name = "Unknown"
+    if hasattr(props, 'company') and hasattr(props.company, 'name'):
+        company_name = props.company.name
+    elif hasattr(props, 'title') and props.title:
+        company_name = props.title
+    elif hasattr(props, 'name') and props.name:
+        company_name = props.name
+    
+    return {
+        "itemId": item.id,
+        "runId": run_id,
+        "leadsetId": leadset_id,
+        "entity": {
+            "company": company_name, 
+            "domain": domain
+        },
+        "snippet": (getattr(props, 'description', "") or "")[:200],
+        "sourceUrl": url,
+        "platform": "Web",
+        "recency": get_current_time(),
+        "score": 0,
+        "enrichment": {"status": "none"},
+        "selected": False
+    }
+
+def iter_webset_items(webset_id: str):
+    """Yield every item in a webset, following pagination cursors."""
+    cursor = None
+    while True:
+        if cursor:
+            page = exa.websets.items.list(webset_id=webset_id, cursor=cursor, limit=100)
+        else:
+            page = exa.websets.items.list(webset_id=webset_id, limit=100)
+        for item in page.data:
+            yield item
+        cursor = getattr(page, 'next_cursor', None)
+        if not getattr(page, 'has_more', False) or not cursor:
+            break
+
+def get_target_count(leadset: dict, held: int = 0) -> int:
+    """
+    Number of new items a run aims for: what the leadset's est_count still
+    lacks after the `held` items carried from the previous run.
+    """
     try:
-        print(f"Waiting for Webset {webset_id} to complete...")
-        exa.websets.wait_until_idle(webset_id)
-        
-        # Retrieve Items
-        items_response = exa.websets.items.list(webset_id=webset_id, limit=100)
+        est_count = int(leadset.get("est_count") or DEFAULT_TARGET_COUNT)
+    except (TypeError, ValueError):
+        est_count = DEFAULT_TARGET_COUNT
+    return min(max(est_count - held, 0), MAX_TARGET_COUNT)
+
+def estimate_cost(requested: int, target: int, new_count: int,
+                  unit_cost: float = EXA_COST_PER_RESULT) -> float:
+    """Spent so far plus the projected cost of the results still needed, at the observed yield."""
+    remaining = max(target - new_count, 0)
+    if requested and new_count:
+        projected = remaining * requested / new_count
+    else:
+        projected = remaining
+    return round((requested + projected) * unit_cost, 4)
+
+def carry_forward_items(run_id: str, leadset_id: str, previous_run_id: Optional[str]) -> List[dict]:
+    """Copy the previous run's items into this run so a rerun only searches for new ones."""
+    if not previous_run_id:
+        return []
+    # Read the item documents themselves: snapshot rows are lossy and may lag behind
+    items = list_run_items(sdk, previous_run_id)
+
+    carried = []
+    for item in items:
+        if not item.get("itemId"):
+            continue
+        carried_item = {k: v for k, v in item.items() if v is not None}
+        carried_item.update({"runId": run_id, "leadsetId": leadset_id})
+        carried.append(carried_item)
+    write_run_items(sdk, run_id, carried)
+    print(f"Carried {len(carried)} items from run {previous_run_id} into {run_id}")
+    return carried
+
+def cancel_webset_enrichments(webset_id: str, enrichment_ids: List[str]) -> List[str]:
+    """
+    Cancel enrichments left on a webset by an earlier run, so appended results
+    are not enriched (and billed) as well. Returns the ones that could not be cancelled.
+    """
+    remaining = []
+    for enrichment_id in enrichment_ids:
+        try:
+            exa.websets.enrichments.cancel(webset_id, enrichment_id)
+            print(f"Cancelled enrichment {enrichment_id} on Webset {webset_id}")
+        except Exception as e:
+            print(f"Failed to cancel enrichment {enrichment_id}: {e}")
+            remaining.append(enrichment_id)
+    return remaining
+
+@profiled_run_task
+def process_run_background(run_id: str, webset_id: str, leadset_id: str, prompt: str,
+                           target_count: int, requested: int, previous_run_id: Optional[str] = None):
+    """
+    Background task to wait for Exa search and process results.
+    The webset is grown in chunks of SEARCH_CHUNK_SIZE until target_count new,
+    deduplicated, above-threshold items exist, or a round stops producing any.
+    Reruns (previous_run_id set) carry the previous run's items and append to
+    its webset; only results returned after this run's first search are billed to it.
+    """
+    try:
+        run_items = carry_forward_items(run_id, leadset_id, previous_run_id)
+        item_ids = [item["itemId"] for item in run_items]
+        # Items already decided on (written, carried, or rejected as duplicate/low score)
+        seen_item_ids = set(item_ids)
+        # Items returned by this run's searches, which is what Exa bills for
+        billed_item_ids = set()
+        seen_domains = {item.get("entity", {}).get("domain") for item in run_items} - {None, "unknown"}
+        # Carried items keep their enrichment, so keep counting them as enriched
+        enriched_count = sum(1 for item in run_items if item.get("enrichment", {}).get("status") == "done")
+        new_count = 0
+        spent = 0
+        unit_cost = EXA_COST_PER_RESULT
+        baseline = set()
+
+        if previous_run_id and target_count > 0:
+            # Items the webset already holds were paid for by earlier runs
+            baseline = {item.id for item in iter_webset_items(webset_id)}
+
+            # Enrichments created on this webset would also run on every appended result
+            previous_run = sdk.get_firebase_data("leadsetRuns", previous_run_id) or {}
+            active_enrichments = cancel_webset_enrichments(webset_id, previous_run.get("enrichmentIds", []))
+            unit_cost = EXA_COST_PER_RESULT + len(active_enrichments) * EXA_ENRICHMENT_COST_PER_RESULT
+            sdk.update_firebase_data("leadsetRuns", run_id, {
+                "enrichmentIds": active_enrichments,
+                "cost": {"estimate": estimate_cost(0, target_count, 0, unit_cost), "spent": 0}
+            })
+
+            exa.websets.searches.create(
+                webset_id=webset_id,
+                params=CreateWebsetSearchParameters(query=prompt, count=requested, behavior="append")
+            )
+            print(f"Webset extended: {webset_id}")
+        elif previous_run_id:
+            # Nothing to search for; keep track of the webset's enrichments for later reruns
+            previous_run = sdk.get_firebase_data("leadsetRuns", previous_run_id) or {}
+            sdk.update_firebase_data("leadsetRuns", run_id, {
+                "enrichmentIds": previous_run.get("enrichmentIds", [])
+            })
+            print(f"Leadset already holds its est_count, run {run_id} skips searching")
+
+        max_rounds = -(-target_count // SEARCH_CHUNK_SIZE) + EXTRA_SEARCH_ROUNDS if target_count > 0 else 0
         
-        processed_count = 0
-        item_ids = []
-        for item in items_response.data:
-            try:
-                item_id = item.id
-                print(f"Processing item {item_id}")
-                
-                # Safe access to properties
-                props = item.properties if hasattr(item, 'properties') else item
-                
-                # Extract URL safely
-                url = getattr(props, 'url', None)
-                if url:
-                    url = str(url)
-
-                # Safely extract domain
-                domain = "unknown"
-                if url:
-                    try:
-                        domain = url.split("//")[-1].split("/")[0]
-                    except: 
-                        pass
-                
-                # Extract Company Name / Title
-                company_name = "Unknown"
-                if hasattr(props, 'company') and hasattr(props.company, 'name'):
-                    company_name = props.company.name
-                elif hasattr(props, 'title') and props.title:
-                    company_name = props.title
-                elif hasattr(props, 'name') and props.name:
-                    company_name = props.name
-                
-                # Map Exa item to our schema
-                new_item = {
-                    "itemId": item_id,
-                    "runId": run_id,
-                    "leadsetId": leadset_id,
-                    "entity": {
-                        "company": company_name, 
-                        "domain": domain
-                    },
-                    "snippet": (getattr(props, 'description', "") or "")[:200],
-                    "sourceUrl": url,
-                    "platform": "Web",
-                    "recency": get_current_time(),
-                    "score": 0,
-                    "enrichment": {"status": "none"},
-                    "selected": False
+        for search_round in range(1, max_rounds + 1):
+            print(f"Waiting for Webset {webset_id} to complete (round {search_round})...")
+            exa.websets.wait_until_idle(webset_id)
+            
+            round_new = 0
+            for item in iter_webset_items(webset_id):
+                if item.id not in baseline:
+                    billed_item_ids.add(item.id)
+                if item.id in seen_item_ids:
+                    continue
+                try:
+                    new_item = map_exa_item(item, run_id, leadset_id)
+                    domain = new_item["entity"]["domain"]
+                    if (domain != "unknown" and domain in seen_domains) or new_item["score"] < MIN_ITEM_SCORE:
+                        seen_item_ids.add(item.id)
+                        continue
+                    
+                    # Write to subcollection
+                    sdk.create_firebase_data(f"leadsetRuns/{run_id}/items", item.id, new_item)
+                except Exception as e:
+                    # Not marked as seen, so the next round retries it
+                    print(f"Error processing item {item.id}: {e}")
+                    continue
+                seen_item_ids.add(item.id)
+                seen_domains.add(domain)
+                run_items.append(new_item)
+                item_ids.append(item.id)
+                round_new += 1
+            new_count += round_new
+            # Exa bills per result returned, duplicates included, but never more than requested
+            spent = round(min(len(billed_item_ids), requested) * unit_cost, 4)
+            
+            # Publish progress after every round so the UI fills up incrementally
+            sdk.update_firebase_data("leadsetRuns", run_id, {
+                "counters": {"found": len(item_ids), "enriched": enriched_count, "selected": 0},
+                "cost": {
+                    "estimate": max(estimate_cost(requested, target_count, new_count, unit_cost), spent),
+                    "spent": spent
                 }
-                
-                # Write to subcollection
-                sdk.create_firebase_data(f"leadsetRuns/{run_id}/items", item_id, new_item)
-                print(f"Processed item {new_item}")
-                processed_count += 1
-                item_ids.append(item_id)
-            except Exception as e:
-                print(f"Error processing item {item.id}: {e}")
-                continue
+            })
+            print(f"Round {search_round}: {round_new} new items ({new_count}/{target_count})")
+            
+            if new_count >= target_count or round_new == 0 or search_round == max_rounds:
+                break
+            
+            # Grow the existing webset instead of starting a new search
+            chunk = min(SEARCH_CHUNK_SIZE, target_count - new_count)
+            exa.websets.searches.create(
+                webset_id=webset_id,
+                params=CreateWebsetSearchParameters(query=prompt, count=chunk, behavior="append")
+            )
+            requested += chunk
         
-        # Update run status to idle
-        sdk.update_firebase_data("leadsetRuns", run_id, {
+        # Update run status to idle.
+        # The snapshot pointer goes out in the same update, so an enrichment
+        # started right after the run goes idle always finds it to mark stale.
+        final_fields = {
             "status": "idle",
             "counters": {
-                "found": processed_count,
-                "enriched": 0,
+                "found": len(item_ids),
+                "enriched": enriched_count,
                 "selected": 0
             },
-            "itemIds": item_ids
-        })
-        print(f"Run {run_id} completed successfully with {processed_count} items.")
+            "cost": {"estimate": spent, "spent": spent}
+        }
+        try:
+            write_run_snapshot(sdk, run_id, run_items, final_fields)
+        except Exception as e:
+            print(f"Snapshot failed for run {run_id}: {e}")
+            sdk.update_firebase_data("leadsetRuns", run_id, final_fields)
+        print(f"Run {run_id} completed successfully with {len(item_ids)} items ({new_count} new).")
         
     except Exception as e:
         print(f"Background processing failed for run {run_id}: {e}")
         sdk.update_firebase_data("leadsetRuns", run_id, {"status": "failed"})
 
+@profiled_run_task
 def process_enrichment_background(run_id: str, webset_id: str, item_ids: List[str]):
     """
     Background task to poll for enrichment results.
@@ -204,12 +391,10 @@ def process_enrichment_background(run_id: str, webset_id: str, item_ids: List[st
         # We only need to fetch the specific items we enriched
         # But Exa list_items doesn't support filtering by ID easily, so we might fetch all 
         # or use get_item if available. For now, let's fetch all and filter or just update all.
-        # Given we have item_ids, let's try to be efficient if possible, but list(limit=100) is safe for now.
-        items_response = exa.websets.items.list(webset_id=webset_id, limit=100)
-        
+        # Websets can grow past one page, so follow the cursor through all of them.
         enriched_count = 0
         
-        for item in items_response.data:
+        for item in iter_webset_items(webset_id):
             if item.id in item_ids:
                 # This is one of the items we requested enrichment for
                 
@@ -281,20 +466,33 @@ def process_enrichment_background(run_id: str, webset_id: str, item_ids: List[st
             # We add the NEWly enriched count. 
             # Note: This is a simple counter, might double count if we re-enrich. 
             # For now, it's fine.
-            sdk.update_firebase_data("leadsetRuns", run_id, {
+            final_fields = {
                "counters": {**run_doc.get("counters", {}), "enriched": current_enriched + enriched_count},
                "status": "idle" # Set back to idle when done
-            })
+            }
+            # Refresh the run snapshot with the new enrichment data, publishing it
+            # together with the stats unless items changed while it was built
+            try:
+                write_run_snapshot(sdk, run_id, run_fields=final_fields)
+            except Exception as e:
+                print(f"Snapshot failed for run {run_id}: {e}")
+                sdk.update_firebase_data("leadsetRuns", run_id, {
+                    **final_fields, **stale_snapshot_fields(run_doc)
+                })
             
         print(f"Enrichment polling finished. Updated {enriched_count} items.")
 
     except Exception as e:
         print(f"Enrichment polling failed: {e}")
         # Don't fail the whole run, just log it
-        sdk.update_firebase_data("leadsetRuns", run_id, {"status": "idle"}) # Reset status so user can try again
+        # Items may be partly enriched, so the snapshot can no longer be trusted
+        sdk.update_firebase_data("leadsetRuns", run_id, {
+            "status": "idle", # Reset status so user can try again
+            **stale_snapshot_fields(sdk.get_firebase_data("leadsetRuns", run_id))
+        })
 
 @app.post("/leadsets/{leadset_id}/run")
-async def start_run(leadset_id: str, background_tasks: BackgroundTasks):
+async def start_run(leadset_id: str, background_tasks: BackgroundTasks, request: Request):
     """
     Start a search using Exa SDK, return immediately, and process in background.
     Maps to OpenAPI: POST /v0/websets
@@ -305,20 +503,39 @@ async def start_run(leadset_id: str, background_tasks: BackgroundTasks):
         raise HTTPException(status_code=404, detail="Leadset not found")
 
     prompt = leadset.get("prompt")
-    print(f"Starting run for Leadset: {leadset_id} with prompt: {prompt}")
+
+    # Reruns grow the previous run's webset instead of searching from scratch
+    previous_run_id = None
+    previous_run = None
+    if leadset.get("lastRunId"):
+        previous_run = sdk.get_firebase_data("leadsetRuns", leadset["lastRunId"])
+    if previous_run and previous_run.get("websetId") and previous_run.get("status") in ("idle", "failed"):
+        previous_run_id = previous_run["id"]
+
+    # Only search for what the leadset still lacks beyond the items carried forward
+    held = previous_run.get("counters", {}).get("found", 0) if previous_run_id else 0
+    target_count = get_target_count(leadset, held)
+    if not previous_run_id:
+        target_count = max(target_count, 1)
+    first_chunk = min(SEARCH_CHUNK_SIZE, target_count)
+    print(f"Starting run for Leadset: {leadset_id} with prompt: {prompt} (target {target_count})")
     
     try:
-        # 2. Create Webset using Exa SDK
-        webset = exa.websets.create(
-            params=CreateWebsetParameters(
-                search={
-                    "query": prompt,
-                    "count": 5 # Defaulting to 50, can be adjusted
-                }
+        # 2. Create the Webset using Exa SDK.
+        # Reruns reuse the previous webset; the append search is made in the background task.
+        if previous_run_id:
+            webset_id = previous_run["websetId"]
+        else:
+            webset = exa.websets.create(
+                params=CreateWebsetParameters(
+                    search={
+                        "query": prompt,
+                        "count": first_chunk
+                    }
+                )
             )
-        )
-        webset_id = webset.id
-        print(f"Webset created: {webset_id}")
+            webset_id = webset.id
+            print(f"Webset created: {webset_id}")
 
         # 3. Create LeadsetRun document in Firebase
         run_id = f"run_{uuid.uuid4().hex[:8]}"
@@ -328,7 +545,9 @@ async def start_run(leadset_id: str, background_tasks: BackgroundTasks):
             "websetId": webset_id,
             "status": "running",
             "counters": {"found": 0, "enriched": 0, "selected": 0},
-            "cost": {"estimate": 0, "spent": 0},
+            "cost": {"estimate": estimate_cost(0, target_count, 0), "spent": 0},
+            "target": target_count,
+            "previousRunId": previous_run_id,
             "startedAt": get_current_time(),
             "createdBy": "system"
         }
@@ -341,7 +560,12 @@ async def start_run(leadset_id: str, background_tasks: BackgroundTasks):
         })
 
         # 4. Add Background Task
-        background_tasks.add_task(process_run_background, run_id, webset_id, leadset_id)
+        if profiling_requested(request):
+            enable_run_profiling(run_id)
+        background_tasks.add_task(
+            process_run_background, run_id, webset_id, leadset_id,
+            prompt, target_count, first_chunk, previous_run_id
+        )
         
         return {
             "runId": run_id, 
@@ -354,7 +578,7 @@ async def start_run(leadset_id: str, background_tasks: BackgroundTasks):
         raise HTTPException(status_code=500, detail=f"Exa Operation Failed: {str(e)}")
 
 @app.post("/leadsets/{leadset_id}/runs/{run_id}/enrich")
-async def enrich_items(leadset_id: str, run_id: str, payload: EnrichRequest, background_tasks: BackgroundTasks):
+async def enrich_items(leadset_id: str, run_id: str, payload: EnrichRequest, background_tasks: BackgroundTasks, request: Request):
     """
     Trigger enrichment using Exa SDK.
     Maps to OpenAPI: POST /v0/websets/{id}/enrichments
@@ -375,10 +599,11 @@ async def enrich_items(leadset_id: str, run_id: str, payload: EnrichRequest, bac
     ]
     
     triggered_count = 0
+    enrichment_ids = []
     for ench in enrichment_configs:
         try:
             # Using params= matches the Python SDK docs provided
-            exa.websets.enrichments.create(
+            enrichment = exa.websets.enrichments.create(
                 webset_id=webset_id,
                 params=CreateEnrichmentParameters(
                     description=ench["desc"],
@@ -386,10 +611,18 @@ async def enrich_items(leadset_id: str, run_id: str, payload: EnrichRequest, bac
                 )
             )
             triggered_count += 1
+            enrichment_ids.append(enrichment.id)
             print(f"Triggered enrichment: {ench['desc']}")
         except Exception as e:
             print(f"Failed to trigger {ench['format']} enrichment: {e}")
 
+    # Record the enrichments so a rerun on this webset can cancel them,
+    # and mark the snapshot stale since the items are about to change
+    sdk.update_firebase_data("leadsetRuns", run_id, {
+        "enrichmentIds": run_doc.get("enrichmentIds", []) + enrichment_ids,
+        **stale_snapshot_fields(run_doc)
+    })
+
     # Mark selected items as "queued" in Firebase so the UI shows spinners
     for item_id in payload.itemIds:
         sdk.update_firebase_data(f"leadsetRuns/{run_id}/items", item_id, {
@@ -398,37 +631,22 @@ async def enrich_items(leadset_id: str, run_id: str, payload: EnrichRequest, bac
         })
     
     # Trigger background polling for results
+    if profiling_requested(request):
+        enable_run_profiling(run_id)
     background_tasks.add_task(process_enrichment_background, run_id, webset_id, payload.itemIds)
     
     return {"status": "success", "triggered_enrichments": triggered_count}
 
 @app.get("/leadsets/{leadset_id}/runs/{run_id}/export")
-async def export_csv(leadset_id: str, run_id: str):
+@profiled_endpoint
+async def export_csv(leadset_id: str, run_id: str, request: Request):
     """Generate CSV and return download URL."""
     try:
-        # Import SDK internals to construct correct path
-        from fn7_sdk.utils import PathBuilder, LOCAL_DEV_JWT_TOKEN
-        from fn7_sdk.jwt_decoder import JWTDecoder
-        
-        # Get collection prefix
-        decoded_token = JWTDecoder.decode_token(LOCAL_DEV_JWT_TOKEN)
-        user_context = JWTDecoder.extract_user_context(decoded_token)
-        collection_index = PathBuilder.get_collection_index(user_context)
-        
-        # Construct path: PREFIX/leadsetRuns/{run_id}/items.{item_id}
-        # This maps to: Collection(PREFIX) -> Doc(leadsetRuns) -> Coll(run_id) -> Doc(items.{item_id})
-        # Wait, if doc_type was "leadsetRuns/{run_id}/items", then path is PREFIX/leadsetRuns/{run_id}/items.{item_id}
-        # This means segments: PREFIX, leadsetRuns, run_id, items.{item_id}
-        
-        # Let's try to stream from the run_id subcollection
-        items_ref = sdk.firebase_client.db.collection(collection_index).document("leadsetRuns").collection(run_id)
-        docs = items_ref.stream()
-        
-        items = []
-        for doc in docs:
-            # Filter for docs that look like items
-            if doc.id.startswith("items."):
-                items.append(doc.to_dict())
+        # Prefer the run snapshot (one object fetch), fall back to streaming the items
+        run_doc = sdk.get_firebase_data("leadsetRuns", run_id)
+        items = load_run_snapshot(sdk, run_doc)
+        if items is None:
+            items = list_run_items(sdk, run_id)
         
         output = io.StringIO()
         writer = csv.writer(output)
@@ -465,7 +683,65 @@ async def export_csv(leadset_id: str, run_id: str):
             f.write(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/leadsets/{leadset_id}/runs/{run_id}/snapshot")
+async def get_run_snapshot(leadset_id: str, run_id: str, sort: Optional[str] = None):
+    """Return every item of a run in one call, served from the run snapshot when available."""
+    run_doc = sdk.get_firebase_data("leadsetRuns", run_id)
+    if not run_doc:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    items = load_run_snapshot(sdk, run_doc)
+    source = "snapshot"
+    if items is None:
+        items = list_run_items(sdk, run_id)
+        source = "firestore"
+
+    if sort == "score":
+        items.sort(key=lambda item: item.get("score") or 0, reverse=True)
+
+    return {"runId": run_id, "count": len(items), "source": source, "items": items}
+
+def apply_exa_event(run_doc: dict, event_type: str, payload: dict):
+    """Apply a verified Exa webhook event to the run it belongs to."""
+    run_id = run_doc["id"]
+
+    # Handle Enrichment Results (Async updates)
+    if event_type == "webset.item.enriched":
+        item_id = payload.get("itemId")
+        # OpenAPI spec says 'enrichments' is an array of EnrichmentResult objects
+        enrichment_results = payload.get("enrichments", [])
+        
+        existing_item = sdk.get_firebase_data(f"leadsetRuns/{run_id}/items", item_id)
+        if existing_item:
+            current_enrichment = existing_item.get("enrichment", {})
+            updates = {"status": "done"}
+            
+            # Flatten enrichment results into our single object structure
+            for result in enrichment_results:
+                # The result field is an array of strings (e.g. ["email@example.com"])
+                result_values = result.get("result", [])
+                val = result_values[0] if result_values else None
+                
+                fmt = result.get("format")
+                if val:
+                    if fmt == "email": updates["email"] = val
+                    elif fmt == "phone": updates["phone"] = val
+                    elif fmt == "url": updates["linkedinUrl"] = val
+            
+            sdk.update_firebase_data(f"leadsetRuns/{run_id}/items", item_id, {
+                "enrichment": {**current_enrichment, **updates}
+            })
+            
+            # Update stats, and mark the snapshot stale until the next rebuild
+            current_enriched = run_doc.get("counters", {}).get("enriched", 0)
+            run_updates = {
+               "counters": {**run_doc.get("counters", {}), "enriched": current_enriched + 1}
+            }
+            run_updates.update(stale_snapshot_fields(run_doc))
+            sdk.update_firebase_data("leadsetRuns", run_id, run_updates)
+
 @app.post("/webhooks/exa")
+@profiled_endpoint
 async def exa_webhook(request: Request):
     """Handle Exa webhooks with signature validation."""
     # 1. Get Headers
@@ -492,45 +768,18 @@ async def exa_webhook(request: Request):
     if not webset_id:
         return {"status": "ignored", "reason": "missing_webset_id"}
 
-    # Find the run associated with this Webset
-    runs = sdk.search_firebase_data("leadsetRuns", {"where": [["websetId", "==", webset_id]], "limit": 1})
+    # Find the run associated with this Webset.
+    # Reruns reuse their predecessor's webset, so the newest run owns it.
+    runs = sdk.search_firebase_data("leadsetRuns", {"where": [["websetId", "==", webset_id]]})
     if not runs:
         return {"status": "ignored", "reason": "run_not_found"}
+    run_doc = max(runs, key=lambda run: run.get("startedAt") or "")
         
-    run_id = runs[0]["id"]
+    run_id = run_doc["id"]
 
-    # Handle Enrichment Results (Async updates)
-    if event_type == "webset.item.enriched":
-        item_id = payload.get("itemId")
-        # OpenAPI spec says 'enrichments' is an array of EnrichmentResult objects
-        enrichment_results = payload.get("enrichments", [])
-        
-        existing_item = sdk.get_firebase_data(f"leadsetRuns/{run_id}/items", item_id)
-        if existing_item:
-            current_enrichment = existing_item.get("enrichment", {})
-            updates = {"status": "done"}
-            
-            # Flatten enrichment results into our single object structure
-            for result in enrichment_results:
-                # The result field is an array of strings (e.g. ["email@example.com"])
-                result_values = result.get("result", [])
-                val = result_values[0] if result_values else None
-                
-                fmt = result.get("format")
-                if val:
-                    if fmt == "email": updates["email"] = val
-                    elif fmt == "phone": updates["phone"] = val
-                    elif fmt == "url": updates["linkedinUrl"] = val
-            
-            sdk.update_firebase_data(f"leadsetRuns/{run_id}/items", item_id, {
-                "enrichment": {**current_enrichment, **updates}
-            })
-            
-            # Update stats
-            current_enriched = runs[0].get("counters", {}).get("enriched", 0)
-            sdk.update_firebase_data("leadsetRuns", run_id, {
-               "counters": {**runs[0].get("counters", {}), "enriched": current_enriched + 1}
-            })
+    # Exa cannot send the profiling headers, so webhooks follow their run's toggle
+    with profile_section(f"exa_webhook_{run_id}", run_profiling_enabled(run_id)):
+        apply_exa_event(run_doc, event_type, payload)
 
     # Note: item_created events might also come in, but we already fetched items
     # synchronously in start_run. We can ignore them or use them to update.
@@ -538,10 +787,48 @@ async def exa_webhook(request: Request):
     return {"status": "processed"}
 
 
+@app.get("/debug/profiles")
+def get_profiles(request: Request):
+    """List stored profile artifacts and the runs currently being profiled."""
+    if not profiling_authorized(request):
+        raise HTTPException(status_code=404, detail="Not found")
+    return {"profiles": list_profiles(), "runs": profiled_run_ids()}
+
+@app.post("/debug/profiles/runs/{run_id}")
+def enable_profiles_for_run(run_id: str, request: Request):
+    """Profile every background job and webhook of a run until switched off."""
+    if not profiling_authorized(request):
+        raise HTTPException(status_code=404, detail="Not found")
+    set_run_profiling(run_id, True)
+    return {"runId": run_id, "profiling": True}
+
+@app.delete("/debug/profiles/runs/{run_id}")
+def disable_profiles_for_run(run_id: str, request: Request):
+    """Stop profiling a run switched on at runtime or by a request."""
+    if not profiling_authorized(request):
+        raise HTTPException(status_code=404, detail="Not found")
+    set_run_profiling(run_id, False)
+    return {"runId": run_id, "profiling": False}
+
+@app.get("/debug/profiles/{name}")
+def download_profile(name: str, request: Request):
+    """Download a profile artifact (.prof for pstats/snakeviz, .txt summary)."""
+    if not profiling_authorized(request):
+        raise HTTPException(status_code=404, detail="Not found")
+    path = profile_path(name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=name)
+
+
 @app.get("/health")
 def health():
     """Health check endpoint"""
-    return {"status": "ok", "sdk_initialized": sdk is not None}
+    return {
+        "status": "ok",
+        "sdk_initialized": sdk is not None,
+        "cache": sdk.cache_stats() if sdk else {}
+    }
 
 
 
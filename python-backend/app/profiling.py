@@ -0,0 +1,192 @@
+"""
+Profiling Hooks
+Opt-in cProfile capture for background jobs and endpoints
+"""
+
+import os
+import io
+import hmac
+import time
+import pstats
+import cProfile
+import functools
+from contextlib import contextmanager
+from typing import List, Optional
+
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes", "on")
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_ARTIFACTS = int(os.getenv("PROFILE_MAX_ARTIFACTS", "50"))
+PROFILE_HEADER = "X-Profile"
+PROFILE_TOKEN_HEADER = "X-Profile-Token"
+PROFILE_QUERY_PARAM = "profile"
+
+# Run IDs whose background jobs are always profiled (PROFILE_RUN_IDS, comma separated)
+_configured_runs = {r.strip() for r in os.getenv("PROFILE_RUN_IDS", "").split(",") if r.strip()}
+# Run IDs switched on at runtime via /debug/profiles/runs/{run_id}; profiled until switched off
+_toggled_runs = set()
+# Run IDs opted in by a request; each is profiled for its next background job only
+_requested_runs = set()
+
+
+def _is_truthy(value: Optional[str]) -> bool:
+    return value is not None and value.lower() in ("1", "true", "yes", "on")
+
+
+def profiling_authorized(request) -> bool:
+    """
+    True if profiling is switched on (PROFILING_ENABLED) and the request carries
+    the shared secret from PROFILE_TOKEN in the X-Profile-Token header.
+    """
+    if not PROFILING_ENABLED or not PROFILE_TOKEN:
+        return False
+    token = request.headers.get(PROFILE_TOKEN_HEADER) or ""
+    return hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+def profiling_requested(request) -> bool:
+    """True if an authorized request opted in via the X-Profile header or ?profile=1."""
+    if not PROFILING_ENABLED:
+        return False
+    opted_in = _is_truthy(request.headers.get(PROFILE_HEADER)) or \
+        _is_truthy(request.query_params.get(PROFILE_QUERY_PARAM))
+    return opted_in and profiling_authorized(request)
+
+
+def enable_run_profiling(run_id: str):
+    _requested_runs.add(run_id)
+
+
+def set_run_profiling(run_id: str, enabled: bool):
+    """Switch profiling of a run's jobs and webhooks on or off at runtime."""
+    if enabled:
+        _toggled_runs.add(run_id)
+    else:
+        _toggled_runs.discard(run_id)
+        _requested_runs.discard(run_id)
+
+
+def profiled_run_ids() -> List[str]:
+    return sorted(_configured_runs | _toggled_runs | _requested_runs)
+
+
+def run_profiling_enabled(run_id: str) -> bool:
+    return PROFILING_ENABLED and (
+        run_id in _configured_runs or run_id in _toggled_runs or run_id in _requested_runs
+    )
+
+
+def _prune_profiles():
+    """Keep only the newest PROFILE_MAX_ARTIFACTS profiles (a .prof and its .txt count as one)."""
+    bases = {}
+    for filename in os.listdir(PROFILE_DIR):
+        base, ext = os.path.splitext(filename)
+        if ext in (".prof", ".txt"):
+            path = os.path.join(PROFILE_DIR, filename)
+            bases[base] = max(bases.get(base, 0), os.path.getmtime(path))
+    oldest_first = sorted(bases, key=bases.get)
+    for base in oldest_first[:max(len(oldest_first) - PROFILE_MAX_ARTIFACTS, 0)]:
+        for ext in (".prof", ".txt"):
+            path = os.path.join(PROFILE_DIR, base + ext)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _write_profile(name: str, profiler: cProfile.Profile, elapsed: float) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = f"{name}_{int(time.time() * 1000)}"
+    prof_path = os.path.join(PROFILE_DIR, f"{base}.prof")
+    profiler.dump_stats(prof_path)
+
+    # Human readable summary next to the raw stats
+    summary = io.StringIO()
+    summary.write(f"{name}: {elapsed:.3f}s wall\n\n")
+    pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(40)
+    with open(os.path.join(PROFILE_DIR, f"{base}.txt"), "w") as f:
+        f.write(summary.getvalue())
+
+    _prune_profiles()
+    return prof_path
+
+
+@contextmanager
+def profile_section(name: str, enabled: bool = True):
+    """Profile the enclosed block with cProfile and store the artifacts under PROFILE_DIR."""
+    if not enabled:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Another profiler is already active on this thread
+        print(f"Profiling skipped for {name}: {e}")
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        try:
+            path = _write_profile(name, profiler, time.perf_counter() - start)
+            print(f"Profile written: {path}")
+        except Exception as e:
+            print(f"Failed to write profile for {name}: {e}")
+
+
+def profiled_run_task(func):
+    """Profile a background task whose first argument is a run ID, if that run is opted in."""
+    @functools.wraps(func)
+    def wrapper(run_id, *args, **kwargs):
+        if not run_profiling_enabled(run_id):
+            return func(run_id, *args, **kwargs)
+        try:
+            with profile_section(f"{func.__name__}_{run_id}"):
+                return func(run_id, *args, **kwargs)
+        finally:
+            # Per-request opt-ins cover a single job
+            _requested_runs.discard(run_id)
+    return wrapper
+
+
+def profiled_endpoint(func):
+    """
+    Profile an async endpoint when the request opts in.
+    The endpoint must take a `request: Request` argument.
+    Callers that cannot send the opt-in headers (e.g. Exa webhooks) should
+    use profile_section with run_profiling_enabled instead.
+    Note: the profiler runs on the event loop thread, so awaits may attribute
+    time from other concurrent requests.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        request = kwargs.get("request")
+        if request is None or not profiling_requested(request):
+            return await func(*args, **kwargs)
+        with profile_section(func.__name__):
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+def list_profiles() -> List[dict]:
+    """List stored profile artifacts, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for filename in os.listdir(PROFILE_DIR):
+        path = os.path.join(PROFILE_DIR, filename)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            profiles.append({"name": filename, "bytes": stat.st_size, "modifiedAt": stat.st_mtime})
+    profiles.sort(key=lambda p: p["modifiedAt"], reverse=True)
+    return profiles
+
+
+def profile_path(name: str) -> Optional[str]:
+    """Resolve a profile artifact by file name, refusing anything outside PROFILE_DIR."""
+    path = os.path.join(PROFILE_DIR, os.path.basename(name))
+    return path if os.path.isfile(path) else None
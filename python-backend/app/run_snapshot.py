@@ -0,0 +1,213 @@
+"""
+Run Snapshots
+Compact, column-oriented summary of all items in a run, stored in Storage
+"""
+
+import gzip
+import json
+import uuid
+import datetime
+import requests
+from typing import List, Optional
+
+
+SNAPSHOT_FOLDER = "snapshots"
+# Firestore allows at most 500 writes per batch
+WRITE_BATCH_SIZE = 400
+SNAPSHOT_VERSION = 1
+
+# Run document field that changes whenever item documents change outside
+# write_run_snapshot; a snapshot built across such a change is not published
+ITEMS_VERSION_FIELD = "itemsVersion"
+
+# Column name -> path into the item document
+COLUMNS = {
+    "itemId": ("itemId",),
+    "company": ("entity", "company"),
+    "domain": ("entity", "domain"),
+    "score": ("score",),
+    "snippet": ("snippet",),
+    "sourceUrl": ("sourceUrl",),
+    "platform": ("platform",),
+    "recency": ("recency",),
+    "selected": ("selected",),
+    "enrichmentStatus": ("enrichment", "status"),
+    "email": ("enrichment", "email"),
+    "phone": ("enrichment", "phone"),
+    "linkedinUrl": ("enrichment", "linkedinUrl"),
+}
+
+
+def _snapshot_filename(run_id: str) -> str:
+    return f"{run_id}.json.gz"
+
+
+def _get_path(item: dict, path: tuple):
+    value = item
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _run_items_ref(sdk, run_id: str):
+    """Firestore collection holding the item documents of a run."""
+    # Import SDK internals to construct correct path
+    from fn7_sdk.utils import PathBuilder, LOCAL_DEV_JWT_TOKEN
+    from fn7_sdk.jwt_decoder import JWTDecoder
+
+    decoded_token = JWTDecoder.decode_token(LOCAL_DEV_JWT_TOKEN)
+    user_context = JWTDecoder.extract_user_context(decoded_token)
+    collection_index = PathBuilder.get_collection_index(user_context)
+
+    # doc_type "leadsetRuns/{run_id}/items" is stored as
+    # Collection(PREFIX) -> Doc(leadsetRuns) -> Coll(run_id) -> Doc(items.{item_id})
+    return sdk.firebase_client.db.collection(collection_index).document("leadsetRuns").collection(run_id)
+
+
+def list_run_items(sdk, run_id: str) -> List[dict]:
+    """Stream every item document under leadsetRuns/{run_id}/items in one query."""
+    items_ref = _run_items_ref(sdk, run_id)
+
+    items = []
+    for doc in items_ref.stream():
+        if doc.id.startswith("items."):
+            items.append(doc.to_dict())
+
+    # This bypasses the document cache, so report the reads to it directly
+    record_reads = getattr(sdk, "record_reads", None)
+    if record_reads:
+        record_reads(run_id, len(items))
+    return items
+
+
+def write_run_items(sdk, run_id: str, items: List[dict]):
+    """Write item documents under leadsetRuns/{run_id}/items in batched commits."""
+    items_ref = _run_items_ref(sdk, run_id)
+    db = sdk.firebase_client.db
+    for start in range(0, len(items), WRITE_BATCH_SIZE):
+        batch = db.batch()
+        for item in items[start:start + WRITE_BATCH_SIZE]:
+            batch.set(items_ref.document(f"items.{item['itemId']}"), item)
+        batch.commit()
+
+
+def encode_snapshot(run_id: str, items: List[dict]) -> bytes:
+    """Pack items into a gzipped, column-oriented JSON document."""
+    columns = {name: [_get_path(item, path) for item in items] for name, path in COLUMNS.items()}
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "runId": run_id,
+        "count": len(items),
+        "columns": columns,
+    }
+    raw = json.dumps(snapshot, separators=(",", ":"), default=str).encode("utf-8")
+    return gzip.compress(raw)
+
+
+def decode_snapshot(blob: bytes) -> List[dict]:
+    """Unpack a snapshot back into item-shaped dicts (entity/enrichment nested)."""
+    snapshot = json.loads(gzip.decompress(blob).decode("utf-8"))
+    columns = snapshot.get("columns", {})
+
+    items = []
+    for i in range(snapshot.get("count", 0)):
+        item = {"runId": snapshot.get("runId")}
+        for name, path in COLUMNS.items():
+            values = columns.get(name)
+            value = values[i] if values and i < len(values) else None
+            if value is None and len(path) > 1:
+                continue
+            target = item
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = value
+        items.append(item)
+    return items
+
+
+def _read_run_fresh(sdk, run_id: str) -> Optional[dict]:
+    invalidate = getattr(sdk, "invalidate", None)
+    if invalidate:
+        invalidate("leadsetRuns", run_id)
+    return sdk.get_firebase_data("leadsetRuns", run_id)
+
+
+def write_run_snapshot(sdk, run_id: str, items: Optional[List[dict]] = None,
+                       run_fields: Optional[dict] = None) -> Optional[dict]:
+    """
+    Build and upload the snapshot for a run, then store a pointer on the run document
+    in the same update as run_fields (e.g. the final status and counters).
+    If items are not passed they are streamed from Firestore.
+    If item documents changed while the snapshot was being built, only run_fields
+    are written and None is returned.
+    """
+    items_version = (_read_run_fresh(sdk, run_id) or {}).get(ITEMS_VERSION_FIELD)
+    if items is None:
+        items = list_run_items(sdk, run_id)
+
+    blob = encode_snapshot(run_id, items)
+    filename = _snapshot_filename(run_id)
+    sdk.upload_to_storage([filename], [blob], folder=SNAPSHOT_FOLDER)
+
+    if (_read_run_fresh(sdk, run_id) or {}).get(ITEMS_VERSION_FIELD) != items_version:
+        print(f"Items of run {run_id} changed while building its snapshot, not publishing it")
+        if run_fields:
+            sdk.update_firebase_data("leadsetRuns", run_id, run_fields)
+        return None
+
+    pointer = {
+        "folder": SNAPSHOT_FOLDER,
+        "filename": filename,
+        "count": len(items),
+        "bytes": len(blob),
+        "version": SNAPSHOT_VERSION,
+        "updatedAt": datetime.datetime.utcnow().isoformat(),
+    }
+    sdk.update_firebase_data("leadsetRuns", run_id, {**(run_fields or {}), "snapshot": pointer})
+    print(f"Snapshot written for run {run_id}: {len(items)} items, {len(blob)} bytes")
+    return pointer
+
+
+def stale_snapshot_fields(run_doc: Optional[dict]) -> dict:
+    """
+    Run document fields recording that item documents changed outside write_run_snapshot:
+    a new items version (so in-flight rebuilds are not published) and, if a snapshot
+    exists, its pointer flagged as stale.
+    """
+    fields = {ITEMS_VERSION_FIELD: uuid.uuid4().hex}
+    pointer = (run_doc or {}).get("snapshot")
+    if pointer and not pointer.get("stale"):
+        fields["snapshot"] = {**pointer, "stale": True}
+    return fields
+
+
+def mark_snapshot_stale(sdk, run_id: str, run_doc: Optional[dict] = None):
+    """
+    Flag the run's snapshot as stale after item documents changed outside
+    write_run_snapshot, so readers fall back to Firestore until the next rebuild.
+    """
+    if run_doc is None:
+        run_doc = sdk.get_firebase_data("leadsetRuns", run_id)
+    sdk.update_firebase_data("leadsetRuns", run_id, stale_snapshot_fields(run_doc))
+
+
+def load_run_snapshot(sdk, run_doc: dict) -> Optional[List[dict]]:
+    """Load all items of a run from its snapshot, or None if there is no usable snapshot."""
+    pointer = (run_doc or {}).get("snapshot")
+    if not pointer or pointer.get("stale") or pointer.get("version") != SNAPSHOT_VERSION:
+        return None
+
+    try:
+        stored = sdk.get_from_storage(pointer["folder"], pointer["filename"])
+        if isinstance(stored, (bytes, bytearray)):
+            blob = bytes(stored)
+        else:
+            response = requests.get(stored, timeout=30)
+            response.raise_for_status()
+            blob = response.content
+        return decode_snapshot(blob)
+    except Exception as e:
+        print(f"Failed to load snapshot for run {run_doc.get('id')}: {e}")
+        return None
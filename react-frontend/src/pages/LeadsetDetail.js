@@ -25,6 +25,8 @@ function LeadsetDetail() {
 
     // Refs
     const initialized = useRef(false);
+    // Snapshot version / item count the items were last loaded for
+    const loadedRunState = useRef(null);
 
     // Load initial data on mount
     useEffect(() => {
@@ -96,6 +98,18 @@ function LeadsetDetail() {
                 currentRun = run && run.id === runId ? run : await sdk.getFirebaseData('leadsetRuns', runId);
             }
 
+            // Prefer the compact run snapshot: one backend call instead of a read per item
+            if (currentRun && currentRun.snapshot && !currentRun.snapshot.stale) {
+                try {
+                    const snapshot = await API.getRunSnapshot(leadsetId, runId);
+                    setItems(snapshot.items || []);
+                    return;
+                } catch (snapshotError) {
+                    console.warn('Snapshot load failed, reading items directly:', snapshotError);
+                }
+            }
+
+            // Runs created before snapshots existed still carry an itemIds list
             if (currentRun && currentRun.itemIds && currentRun.itemIds.length > 0) {
                 const itemPromises = currentRun.itemIds.map(itemId =>
                     sdk.getFirebaseData(`leadsetRuns/${runId}/items`, itemId)
@@ -162,9 +176,15 @@ function LeadsetDetail() {
                     console.log('Run status updated:', updatedRun.status);
                     setRun(updatedRun);
 
-                    // Trigger item load if itemIds are present
-                    // This ensures we fetch items when the run completes and populates itemIds
-                    if (updatedRun.itemIds && updatedRun.itemIds.length > 0) {
+                    // Reload items when a fresh snapshot is published, or (without one)
+                    // when the number of found items changes
+                    const snapshot = updatedRun.snapshot;
+                    const found = updatedRun.counters ? updatedRun.counters.found : 0;
+                    const runState = snapshot && !snapshot.stale
+                        ? `snapshot:${snapshot.updatedAt}:${snapshot.count}`
+                        : `found:${found}`;
+                    if (found > 0 && runState !== loadedRunState.current) {
+                        loadedRunState.current = runState;
                         loadRunItems(updatedRun.id, updatedRun);
                     }
                 }
@@ -67,6 +67,19 @@ class API {
         return response.json();
     }
 
+    /**
+     * Get all items of a run from its compact snapshot
+     */
+    static async getRunSnapshot(leadsetId, runId, sort = 'score') {
+        const response = await fetch(`${API_BASE_URL}/leadsets/${leadsetId}/runs/${runId}/snapshot?sort=${sort}`);
+
+        if (!response.ok) {
+            throw new Error(`Failed to fetch run snapshot: ${response.statusText}`);
+        }
+
+        return response.json();
+    }
+
     /**
      * Export run as CSV
      */